@@ -39,6 +39,7 @@ SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "").strip()
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+TELEGRAM_PERSISTENCE_FILE = os.getenv("TELEGRAM_PERSISTENCE_FILE", "matruraksha_state.pkl")
 
 if not SUPABASE_URL or not SUPABASE_KEY:
     logger.warning("⚠️  Supabase credentials not found in .env")
@@ -158,15 +159,35 @@ def run_telegram_bot():
                 handle_home_action,
                 handle_document_upload,
                 handle_text_message,
+                post_init,
+                post_shutdown,
             )
-            from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, ConversationHandler, filters
+            from telegram.ext import Application, AIORateLimiter, PicklePersistence, CommandHandler, MessageHandler, CallbackQueryHandler, ConversationHandler, filters
             from telegram import Update
         except ImportError as e:
             logger.error(f"⚠️  Could not import telegram_bot: {e}")
             return
         
         # Build application IN THIS EVENT LOOP
-        application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+        application = (
+            Application.builder()
+            .token(TELEGRAM_BOT_TOKEN)
+            # Throttle outgoing calls to Telegram's flood limits and retry on 429
+            .rate_limiter(AIORateLimiter(
+                overall_max_rate=29,
+                overall_time_period=1,
+                group_max_rate=19,
+                group_time_period=60,
+                max_retries=3,
+            ))
+            # Keep user/chat data (active profile, cached mothers) across restarts
+            # on_flush: handlers only update in-memory copies; the file is rewritten by
+            # the periodic flush in telegram_bot.post_init and once at shutdown
+            .persistence(PicklePersistence(filepath=TELEGRAM_PERSISTENCE_FILE, on_flush=True))
+            .post_init(post_init)
+            .post_shutdown(post_shutdown)
+            .build()
+        )
         
         # Create bot instance
         bot = MatruRakshaBot()
@@ -200,7 +221,7 @@ def run_telegram_bot():
             },
             fallbacks=[CommandHandler('cancel', bot.cancel_registration)],
             name="registration",
-            persistent=False,
+            persistent=True,
             per_message=False
         )
         
@@ -215,6 +236,9 @@ def run_telegram_bot():
         
         # Initialize the application
         loop.run_until_complete(application.initialize())
+        # Lifecycle hooks only fire automatically under run_polling(); call them here
+        if application.post_init:
+            loop.run_until_complete(application.post_init(application))
         
         logger.info("✅ Telegram Bot initialized successfully")
         
@@ -245,6 +269,8 @@ def run_telegram_bot():
                 loop.run_until_complete(telegram_bot_app.updater.stop())
                 loop.run_until_complete(telegram_bot_app.stop())
                 loop.run_until_complete(telegram_bot_app.shutdown())
+                if telegram_bot_app.post_shutdown:
+                    loop.run_until_complete(telegram_bot_app.post_shutdown(telegram_bot_app))
         except:
             pass
         loop.close()
@@ -10,6 +10,7 @@ from datetime import datetime
 import json
 import google.generativeai as genai
 from supabase import create_client
+from .supabase_service import run_db
 
 logger = logging.getLogger(__name__)
 
@@ -480,7 +481,7 @@ async def save_chat_history(
     payload = {k: v for k, v in payload.items() if v is not None}
 
     try:
-        supabase.table("telegram_logs").insert(payload).execute()
+        await run_db(supabase.table("telegram_logs").insert(payload).execute)
         logger.debug("💬 Chat history saved to telegram_logs")
         return True
     except Exception as exc:
@@ -4,8 +4,12 @@ Handles all Supabase database operations
 """
 
 import os
+import asyncio
+import functools
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from collections import defaultdict
 from typing import Dict, Any, List, Optional
 from supabase import create_client, Client
 
@@ -19,6 +23,27 @@ SUPABASE_KEY = SUPABASE_SERVICE_KEY or os.getenv("SUPABASE_KEY")
 # Use service role key if available to bypass RLS for server-side inserts
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY) if SUPABASE_URL and SUPABASE_KEY else None
 
+# supabase-py is synchronous; its calls run on a bounded pool so they never block
+# the event loop and cannot exhaust threads under load
+_DB_EXECUTOR = ThreadPoolExecutor(max_workers=16, thread_name_prefix="supabase")
+
+
+async def run_db(fn, *args, **kwargs):
+    """Run a blocking Supabase call on the shared database thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_DB_EXECUTOR, functools.partial(fn, *args, **kwargs))
+
+
+# Strong references to in-flight batch tasks so they are not garbage collected
+_BATCH_TASKS: set = set()
+
+
+def _start_batch(coro) -> asyncio.Task:
+    task = asyncio.get_running_loop().create_task(coro)
+    _BATCH_TASKS.add(task)
+    task.add_done_callback(_BATCH_TASKS.discard)
+    return task
+
 
 async def get_mothers_by_telegram_id(telegram_chat_id: str) -> List[Dict[str, Any]]:
     """Return all mother profiles linked to a Telegram chat ID."""
@@ -26,12 +51,12 @@ async def get_mothers_by_telegram_id(telegram_chat_id: str) -> List[Dict[str, An
         return []
 
     try:
-        response = (
+        response = await run_db(
             supabase.table("mothers")
             .select("*")
             .eq("telegram_chat_id", str(telegram_chat_id))
             .order("created_at", desc=True)
-            .execute()
+            .execute
         )
         return response.data or []
     except Exception as exc:
@@ -42,6 +67,224 @@ async def get_mothers_by_telegram_id(telegram_chat_id: str) -> List[Dict[str, An
         return []
 
 
+async def get_mothers_by_telegram_ids(telegram_chat_ids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Return mother profiles for several chat IDs in one query, grouped by chat ID.
+    Errors are raised rather than returned as empty results, so callers never
+    mistake a failed lookup for chats with no mothers.
+    """
+    if not telegram_chat_ids:
+        return {}
+
+    response = await run_db(
+        supabase.table("mothers")
+        .select("*")
+        .in_("telegram_chat_id", [str(chat_id) for chat_id in telegram_chat_ids])
+        .order("created_at", desc=True)
+        .execute
+    )
+
+    grouped: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for row in response.data or []:
+        grouped[str(row.get("telegram_chat_id"))].append(row)
+    return grouped
+
+
+class AsyncBatcher:
+    """
+    Collect (item, future) pairs and hand them to `_process_batch` together, either
+    once `max_batch_size` items are queued or `max_queue_time` seconds after the first.
+    Subclasses implement `_process_batch` and resolve every future they receive.
+    """
+
+    def __init__(self, max_batch_size: int, max_queue_time: float):
+        self.max_batch_size = max_batch_size
+        self.max_queue_time = max_queue_time
+        self._pending: List[tuple] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    async def _enqueue(self, item: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_queue_time, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            _start_batch(self._process_batch(batch))
+
+    async def _process_batch(self, batch: List[tuple]) -> None:
+        raise NotImplementedError
+
+    @staticmethod
+    def _resolve(future: asyncio.Future, result: Any = None, exc: Optional[BaseException] = None) -> None:
+        if future.done():
+            return
+        if exc is not None:
+            future.set_exception(exc)
+        else:
+            future.set_result(result)
+
+
+class MothersBatcher(AsyncBatcher):
+    """
+    Coalesce concurrent mother lookups into a single `telegram_chat_id IN (...)` query.
+    Requests arriving within `max_queue_time` seconds share one round-trip.
+    """
+
+    def __init__(self, max_batch_size: int = 25, max_queue_time: float = 0.02):
+        super().__init__(max_batch_size, max_queue_time)
+
+    async def load(self, telegram_chat_id: str) -> List[Dict[str, Any]]:
+        if not telegram_chat_id:
+            return []
+        return await self._enqueue(str(telegram_chat_id))
+
+    async def _process_batch(self, batch: List[tuple]) -> None:
+        chat_ids = list(dict.fromkeys(chat_id for chat_id, _ in batch))
+        try:
+            grouped = await get_mothers_by_telegram_ids(chat_ids)
+        except Exception as exc:
+            logger.error(
+                f"❌ Error fetching mothers for {len(chat_ids)} telegram chats: {exc}",
+                exc_info=True,
+            )
+            for _, future in batch:
+                self._resolve(future, exc=exc)
+            return
+
+        for chat_id, future in batch:
+            self._resolve(future, result=list(grouped.get(chat_id, [])))
+
+
+mothers_batcher = MothersBatcher()
+
+
+# Columns written when registering a mother; built once and reused for every insert
+MOTHER_INSERT_COLUMNS = (
+    "name",
+    "age",
+    "phone",
+    "due_date",
+    "location",
+    "gravida",
+    "parity",
+    "bmi",
+    "preferred_language",
+    "telegram_chat_id",
+    "created_at",
+)
+
+
+def _mother_row(payload: Dict[str, Any]) -> Dict[str, Any]:
+    return {column: payload.get(column) for column in MOTHER_INSERT_COLUMNS}
+
+
+async def _insert_mother_rows(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Insert one or more mother rows in a single INSERT ... RETURNING request."""
+    response = await run_db(
+        supabase.table("mothers")
+        .insert(rows, returning="representation")
+        .execute
+    )
+    return response.data or []
+
+
+class MotherInsertBatcher(AsyncBatcher):
+    """
+    Coalesce registrations arriving within `max_queue_time` seconds into one
+    multi-row insert. Saved rows are matched back to callers by `phone`, which is
+    unique, since RETURNING order is not guaranteed; if the batch fails, rows are
+    retried one by one so a bad row cannot fail its neighbours.
+    """
+
+    def __init__(self, max_batch_size: int = 32, max_queue_time: float = 0.01):
+        super().__init__(max_batch_size, max_queue_time)
+
+    async def submit(self, row: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return await self._enqueue(row)
+
+    async def _process_batch(self, batch: List[tuple]) -> None:
+        rows = [row for row, _ in batch]
+        try:
+            saved = await _insert_mother_rows(rows)
+        except Exception as exc:
+            if len(batch) == 1:
+                self._resolve(batch[0][1], exc=exc)
+                return
+            # A multi-row INSERT is atomic, so nothing was written; retry per row
+            logger.warning(f"⚠️ Batched mother insert of {len(batch)} rows failed, retrying individually: {exc}")
+            for row, future in batch:
+                try:
+                    single = await _insert_mother_rows([row])
+                    self._resolve(future, result=single[0] if single else None)
+                except Exception as row_exc:
+                    self._resolve(future, exc=row_exc)
+            return
+
+        saved_by_phone = {str(row.get("phone")): row for row in saved}
+        for row, future in batch:
+            self._resolve(future, result=saved_by_phone.get(str(row.get("phone"))))
+
+
+mother_insert_batcher = MotherInsertBatcher()
+
+
+async def insert_mother(payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Insert a mother profile (INSERT ... RETURNING via PostgREST) and return the saved row."""
+    return await mother_insert_batcher.submit(_mother_row(payload))
+
+
+# Rows per request for bulk imports; large enough to amortize round-trips while
+# keeping each PostgREST payload well under request size limits
+BULK_INSERT_CHUNK_SIZE = 1000
+
+
+async def bulk_register(rows: List[Dict[str, Any]], chunk_size: int = BULK_INSERT_CHUNK_SIZE) -> Dict[str, Any]:
+    """
+    Insert many mother profiles (e.g. CSV/admin imports) with one multi-row insert per chunk.
+    Bypasses the registration batcher. Only the columns present in each row are sent, so
+    omitted ones such as created_at take their database defaults. Chunks are committed
+    independently; returns the saved rows and the (start, end, error) of failed chunks.
+    """
+    result: Dict[str, Any] = {"saved": [], "failed_chunks": []}
+    if not supabase:
+        logger.error("❌ Bulk register skipped: Supabase not connected")
+        return result
+
+    for start in range(0, len(rows), chunk_size):
+        end = min(start + chunk_size, len(rows))
+        chunk = [
+            {column: row[column] for column in MOTHER_INSERT_COLUMNS if row.get(column) is not None}
+            for row in rows[start:end]
+        ]
+        try:
+            response = await run_db(
+                supabase.table("mothers")
+                .insert(chunk, returning="representation", default_to_null=False)
+                .execute
+            )
+            result["saved"].extend(response.data or [])
+        except Exception as exc:
+            logger.error(f"❌ Bulk register failed for rows {start}-{end - 1}: {exc}")
+            result["failed_chunks"].append((start, end, str(exc)))
+
+    logger.info(
+        f"✅ Bulk registered {len(result['saved'])} of {len(rows)} mothers; "
+        f"{len(result['failed_chunks'])} chunk(s) failed"
+    )
+    return result
+
+
 async def get_mother_by_telegram_id(telegram_chat_id: str) -> Optional[Dict[str, Any]]:
     """Helper that returns the most recent mother profile for a chat ID."""
     mothers = await get_mothers_by_telegram_id(telegram_chat_id)
@@ -57,13 +300,13 @@ async def get_recent_reports_for_mother(mother_id: str, limit: int = 5) -> List[
         return []
 
     try:
-        response = (
+        response = await run_db(
             supabase.table("medical_reports")
             .select("*")
             .eq("mother_id", str(mother_id))
             .order("uploaded_at", desc=True)
             .limit(limit)
-            .execute()
+            .execute
         )
         return response.data or []
     except Exception as exc:
@@ -6,14 +6,20 @@ document uploads, and AI-powered answers.
 """
 
 import os
+import sys
 import json
+import asyncio
 import html
 import logging
+import time
+import functools
+import mimetypes
 from uuid import uuid4
 from datetime import datetime, timedelta
 from typing import Optional, List, Dict, Any
 
 import aiohttp
+import orjson
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.constants import ParseMode
 from telegram.ext import (
@@ -27,8 +33,10 @@ from telegram.ext import (
 )
 
 from services.supabase_service import (
-    get_mothers_by_telegram_id,
     get_recent_reports_for_mother,
+    insert_mother,
+    mothers_batcher,
+    run_db,
     supabase,
 )
 from agents.orchestrator import route_message
@@ -43,6 +51,9 @@ logger = logging.getLogger(__name__)
 
 TELEGRAM_BOT_TOKEN = (os.getenv("TELEGRAM_BOT_TOKEN") or "").strip()
 BACKEND_API_BASE_URL = (os.getenv("BACKEND_API_BASE_URL") or "http://localhost:8000").strip()
+REPORTS_BUCKET = (os.getenv("SUPABASE_REPORTS_BUCKET") or "medical_reports").strip()
+# Signed report URLs must outlive analyzer retries; Telegram file links expire after ~1 hour
+REPORT_URL_TTL_SECONDS = 7 * 24 * 3600
 
 # Dashboard & summary configuration
 MAX_TIMELINE_EVENTS = 5
@@ -61,64 +72,328 @@ LANG_MAP = {
     "mr": "mr",
 }
 
+# File extensions accepted for medical report uploads
+_ALLOWED_TYPES = frozenset({"pdf", "jpg", "jpeg", "png", "webp"})
+
+
+def _orjson_dumps(obj: Any) -> str:
+    # aiohttp's json_serialize must return str; orjson produces bytes
+    return orjson.dumps(obj).decode()
+
+
+# Shared HTTP session (keep-alive pool reused across handlers)
+_HTTP_SESSION: Optional[aiohttp.ClientSession] = None
+
+
+async def get_session() -> aiohttp.ClientSession:
+    """Return the shared aiohttp session, creating it on first use."""
+    global _HTTP_SESSION
+    if _HTTP_SESSION is None or _HTTP_SESSION.closed:
+        connector = aiohttp.TCPConnector(
+            limit=100,
+            limit_per_host=20,
+            ttl_dns_cache=300,
+            keepalive_timeout=75,
+        )
+        _HTTP_SESSION = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=60),
+            json_serialize=_orjson_dumps,
+        )
+    return _HTTP_SESSION
+
+
+async def close_session() -> None:
+    """Close the shared aiohttp session if it is open."""
+    global _HTTP_SESSION
+    if _HTTP_SESSION is not None and not _HTTP_SESSION.closed:
+        await _HTTP_SESSION.close()
+    _HTTP_SESSION = None
+
+
+# Persistence is built with on_flush=True, so state only reaches disk when flushed;
+# this bounds the synchronous pickle rewrite to one per interval
+PERSISTENCE_FLUSH_INTERVAL = 300
+_PERSISTENCE_FLUSH_TASK: Optional[asyncio.Task] = None
+
+
+async def _flush_persistence_periodically(application) -> None:
+    while True:
+        await asyncio.sleep(PERSISTENCE_FLUSH_INTERVAL)
+        try:
+            await application.persistence.flush()
+        except Exception as exc:
+            logger.warning("Persistence flush failed: %s", exc)
+
+
+async def post_init(application) -> None:
+    """Application hook: open the shared HTTP session and start periodic persistence flushes."""
+    global _PERSISTENCE_FLUSH_TASK
+    await get_session()
+    if application.persistence is not None:
+        _PERSISTENCE_FLUSH_TASK = asyncio.create_task(_flush_persistence_periodically(application))
+
+
+async def post_shutdown(application) -> None:
+    """Application hook: stop periodic flushes and close the shared HTTP session."""
+    global _PERSISTENCE_FLUSH_TASK
+    # Application.shutdown() has already written the final flush
+    if _PERSISTENCE_FLUSH_TASK is not None:
+        _PERSISTENCE_FLUSH_TASK.cancel()
+        _PERSISTENCE_FLUSH_TASK = None
+    await close_session()
+
+
+# Strong references to fire-and-forget tasks so they are not garbage collected
+_BACKGROUND_TASKS: set = set()
+
+
+def _on_task_done(task: asyncio.Task) -> None:
+    _BACKGROUND_TASKS.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning("Background task failed: %s", task.exception())
+
+
+def _spawn(coro) -> asyncio.Task:
+    """Run a coroutine in the background, keeping it alive until it finishes."""
+    task = asyncio.create_task(coro)
+    _BACKGROUND_TASKS.add(task)
+    task.add_done_callback(_on_task_done)
+    return task
+
+
+def _lru_put(cache: Dict[str, tuple], key: str, entry: tuple, maxsize: int) -> None:
+    """Insert an entry as most recently used, evicting the least recently used beyond maxsize."""
+    # dicts keep insertion order, so re-inserting marks the entry most recently used
+    cache.pop(key, None)
+    cache[key] = entry
+    while len(cache) > maxsize:
+        cache.pop(next(iter(cache)))
+
+
+def _lru_get(cache: Dict[str, tuple], key: str, ttl: float) -> Optional[tuple]:
+    """Return a (stored_at, value) entry younger than ttl, marking it most recently used."""
+    hit = cache.get(key)
+    if hit is None or time.monotonic() - hit[0] >= ttl:
+        return None
+    cache[key] = cache.pop(key)
+    return hit
+
+
+# Per-chat TTL + LRU cache of mother profiles: chat_id -> (fetched_at, mothers)
+_MOTHERS_CACHE: Dict[str, tuple] = {}
+MOTHERS_CACHE_TTL = 30
+MOTHERS_CACHE_MAXSIZE = 5000
+
+
+def _fresh_cached_mothers(chat_id: str, ttl: float = MOTHERS_CACHE_TTL) -> Optional[List[Dict[str, Any]]]:
+    hit = _lru_get(_MOTHERS_CACHE, chat_id, ttl)
+    return hit[1] if hit else None
+
+
+async def cached_mothers(chat_id: str, ttl: float = MOTHERS_CACHE_TTL) -> List[Dict[str, Any]]:
+    """Return mothers linked to a chat, reusing a recent lookup when available."""
+    mothers = _fresh_cached_mothers(chat_id, ttl)
+    if mothers is not None:
+        return mothers
+    fetched_at = time.monotonic()
+    data = await mothers_batcher.load(chat_id)
+    _lru_put(_MOTHERS_CACHE, chat_id, (fetched_at, data), MOTHERS_CACHE_MAXSIZE)
+    return data
+
+
+def prime_mothers_cache(chat_id: Optional[str], mothers: List[Dict[str, Any]]) -> None:
+    """Seed the cache with a mothers list that is already known to be current."""
+    if chat_id:
+        _lru_put(_MOTHERS_CACHE, chat_id, (time.monotonic(), mothers), MOTHERS_CACHE_MAXSIZE)
+
+
+def invalidate_mothers_cache(chat_id: Optional[str]) -> None:
+    """Drop the cached mother list for a chat after it changes."""
+    if chat_id:
+        _MOTHERS_CACHE.pop(chat_id, None)
+
+
+# Summary payload cache with single-flight de-duplication per mother_id
+_SUMMARY_CACHE: Dict[str, tuple] = {}
+_SUMMARY_INFLIGHT: Dict[str, asyncio.Future] = {}
+SUMMARY_CACHE_TTL = 60
+SUMMARY_CACHE_MAXSIZE = 2000
+
+
+async def _get_summary(mother_id: str) -> Dict[str, Any]:
+    session = await get_session()
+    url = f"{BACKEND_API_BASE_URL}/api/v1/summary/{mother_id}"
+    timeout = aiohttp.ClientTimeout(total=25)
+    async with session.get(url, timeout=timeout) as resp:
+        if resp.status != 200:
+            raise RuntimeError(f"Summary API returned {resp.status}")
+        return await resp.json(content_type=None, loads=orjson.loads)
+
+
+async def fetch_summary(mother_id: str, ttl: float = SUMMARY_CACHE_TTL) -> Dict[str, Any]:
+    """Return the backend summary for a mother, sharing fresh and in-flight results."""
+    hit = _lru_get(_SUMMARY_CACHE, mother_id, ttl)
+    if hit:
+        return hit[1]
+
+    inflight = _SUMMARY_INFLIGHT.get(mother_id)
+    if inflight is not None:
+        return await asyncio.shield(inflight)
+
+    future = asyncio.get_running_loop().create_future()
+    _SUMMARY_INFLIGHT[mother_id] = future
+    try:
+        payload = await _get_summary(mother_id)
+        _lru_put(_SUMMARY_CACHE, mother_id, (time.monotonic(), payload), SUMMARY_CACHE_MAXSIZE)
+        future.set_result(payload)
+        return payload
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as exc:
+        future.set_exception(exc)
+        # Mark retrieved so an unawaited failure does not log a warning
+        future.exception()
+        raise
+    finally:
+        _SUMMARY_INFLIGHT.pop(mother_id, None)
+
+
+def invalidate_summary_cache(mother_id: Optional[str]) -> None:
+    """Drop the cached summary so the next request sees fresh uploads."""
+    if mother_id:
+        _SUMMARY_CACHE.pop(str(mother_id), None)
+
+
+# Python 3.11+ parses a trailing "Z" natively; older versions need it rewritten
+if sys.version_info >= (3, 11):
+    _parse_iso = datetime.fromisoformat
+else:
+    def _parse_iso(value: str) -> datetime:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+@functools.lru_cache(maxsize=1024)
 def _format_date(date_str: Optional[str]) -> str:
     if not date_str:
         return "N/A"
     try:
-        dt = datetime.fromisoformat(date_str.replace("Z", "+00:00"))
+        dt = _parse_iso(date_str)
         return dt.strftime("%d %b %Y")
     except Exception:
         return date_str[:10]
 
 
-def _calculate_pregnancy_status(due_date: Optional[str]) -> Optional[str]:
-    if not due_date:
-        return None
+@functools.lru_cache(maxsize=1024)
+def _pregnancy_status_on(due_date: str, today_ordinal: int) -> Optional[str]:
+    # Keyed by day so cached results roll over at midnight
     try:
-        due = datetime.fromisoformat(due_date.replace("Z", "+00:00"))
+        due = _parse_iso(due_date)
         conception = due - timedelta(weeks=40)
-        weeks = max(0, min(42, (datetime.now() - conception).days // 7))
+        today = datetime.fromordinal(today_ordinal)
+        weeks = max(0, min(42, (today - conception).days // 7))
         months = max(1, min(10, weeks // 4 or 1))
         return f"Week {weeks} (Month {months})"
     except Exception:
         return None
 
 
+def _calculate_pregnancy_status(due_date: Optional[str]) -> Optional[str]:
+    if not due_date:
+        return None
+    return _pregnancy_status_on(due_date, datetime.now().toordinal())
+
+
+def _remember_mothers(context: ContextTypes.DEFAULT_TYPE, mothers: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Store the mothers list in user_data along with an id -> mother index.
+
+    Also records whether the chat has any mothers, letting registration skip the
+    follow-up lookup for first-time users.
+    """
+    mothers_by_id = {str(m.get("id")): m for m in mothers}
+    context.chat_data["had_prior_mothers"] = bool(mothers)
+    context.user_data["mothers_list"] = mothers
+    context.user_data["mothers_by_id"] = mothers_by_id
+    return mothers_by_id
+
+
+MOTHERS_LOAD_FAIL_MSG = "⚠️ Could not load your profiles right now. Please try again in a moment."
+
+
+async def _load_mothers(context: ContextTypes.DEFAULT_TYPE, chat_id: str) -> Optional[List[Dict[str, Any]]]:
+    """Fetch and remember a chat's mothers, returning None if the lookup failed.
+
+    A failed lookup is neither cached nor remembered, so a transient database
+    error is never mistaken for a chat with no registered mothers.
+    """
+    try:
+        mothers = await cached_mothers(chat_id)
+    except Exception:
+        logger.warning("Could not load mothers for chat %s", chat_id, exc_info=True)
+        return None
+    _remember_mothers(context, mothers)
+    return mothers
+
+
+# Static dashboard rows; buttons are immutable so they are shared across renders
+_STATIC_ROWS: List[List[InlineKeyboardButton]] = [
+    [InlineKeyboardButton("📄 Health Reports", callback_data="action_summary")],
+    [InlineKeyboardButton("🔁 Switch Profiles", callback_data="action_open_switch")],
+    [InlineKeyboardButton("📎 Upload Documents", callback_data="action_upload_hint")],
+    [InlineKeyboardButton("🆕 Register Another Mother", callback_data="action_register")],
+]
+_HIDE_ROW: List[InlineKeyboardButton] = [
+    InlineKeyboardButton("❌ Hide Profiles", callback_data="action_close_switch")
+]
+# Markup for the default (switch panel hidden) dashboard, which has no per-mother rows
+DASHBOARD_MARKUP = InlineKeyboardMarkup(_STATIC_ROWS)
+
+
 def _build_dashboard_keyboard(
     mothers: List[Dict[str, Any]],
     active_id: Optional[str],
     show_switch_panel: bool = False,
 ) -> InlineKeyboardMarkup:
-    rows: List[List[InlineKeyboardButton]] = [
-        [InlineKeyboardButton("📄 Health Reports", callback_data="action_summary")],
-        [InlineKeyboardButton("🔁 Switch Profiles", callback_data="action_open_switch")],
-        [InlineKeyboardButton("📎 Upload Documents", callback_data="action_upload_hint")],
-        [InlineKeyboardButton("🆕 Register Another Mother", callback_data="action_register")],
-    ]
+    if not show_switch_panel:
+        return DASHBOARD_MARKUP
 
-    switch_buttons: List[List[InlineKeyboardButton]] = []
+    rows: List[List[InlineKeyboardButton]] = list(_STATIC_ROWS)
+    rows.append(_HIDE_ROW)
+    active_key = str(active_id)
     for mother in mothers:
         mother_id = str(mother.get("id"))
-        if not mother_id or mother_id == str(active_id):
+        if not mother_id or mother_id == active_key:
             continue
         label = mother.get("name") or "Mother"
-        switch_buttons.append([
+        rows.append([
             InlineKeyboardButton(f"👩 {label}", callback_data=f"switch_mother_{mother_id}")
         ])
 
-    if show_switch_panel:
-        rows.append([InlineKeyboardButton("❌ Hide Profiles", callback_data="action_close_switch")])
-        rows.extend(switch_buttons)
-
     return InlineKeyboardMarkup(rows)
 
+# Chats that have used /start since this process started; the first /start after a
+# restart may trust the mothers list restored by persistence, later ones go to the cache/DB
+_SEEN_CHATS: set = set()
+
+
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = str(update.effective_chat.id)
     context.user_data["chat_id"] = chat_id
 
-    mothers = await get_mothers_by_telegram_id(chat_id)
+    mothers = None
+    if chat_id not in _SEEN_CHATS:
+        _SEEN_CHATS.add(chat_id)
+        # After a restart, reuse the list restored by persistence instead of re-querying
+        mothers = context.user_data.get("mothers_list")
+        if mothers:
+            prime_mothers_cache(chat_id, mothers)
+    if not mothers:
+        mothers = await _load_mothers(context, chat_id)
+        if mothers is None:
+            await update.message.reply_text(MOTHERS_LOAD_FAIL_MSG)
+            return
     if not mothers:
-        context.user_data["mothers_list"] = []
         context.user_data.pop("active_mother", None)
         keyboard = InlineKeyboardMarkup([
             [InlineKeyboardButton("🆕 Register Mother", callback_data="register_new")]
@@ -132,18 +407,35 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(text, parse_mode=ParseMode.MARKDOWN, reply_markup=keyboard)
         return
 
-    context.user_data["mothers_list"] = mothers
+    _remember_mothers(context, mothers)
     active = context.user_data.get("active_mother") or mothers[0]
     context.user_data["active_mother"] = active
     context.user_data["show_switch_panel"] = False
 
     await send_home_dashboard(update, context, mother=active, mothers=mothers, as_new_message=True)
 
+# chat_data flags set while a registration conversation is in progress
+_REG_FLAGS = {"registration_active": True, "agents_suspended": True}
+
+
+def _enter_registration(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Suspend agents, mark registration active and reset collected answers."""
+    context.chat_data.update(_REG_FLAGS)
+    context.user_data["registration_data"] = {}
+
+
+_REG_CLEAR_FLAGS = {"registration_active": False, "agents_suspended": False}
+
+
+def _end_registration(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Resume agents, clear the registration flags and drop collected answers."""
+    context.chat_data.update(_REG_CLEAR_FLAGS)
+    context.user_data.pop("registration_data", None)
+
+
 async def register(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Suspend agents and mark registration active when starting via /register
-    context.chat_data['registration_active'] = True
-    context.chat_data['agents_suspended'] = True
-    context.user_data['registration_data'] = {}
+    _enter_registration(context)
     await update.message.reply_text("Please enter your full name:")
     return AWAITING_NAME
 
@@ -161,8 +453,10 @@ async def send_home_dashboard(
 
     if mothers is None:
         if chat_id:
-            mothers = await get_mothers_by_telegram_id(chat_id)
-            context.user_data["mothers_list"] = mothers
+            mothers = await _load_mothers(context, chat_id)
+            if mothers is None:
+                await context.bot.send_message(chat_id=chat_id, text=MOTHERS_LOAD_FAIL_MSG)
+                return
         else:
             mothers = []
 
@@ -228,28 +522,28 @@ async def handle_home_action(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
     # Block all actions except starting registration when registration is active
     if context.chat_data.get('registration_active') and action != "register":
-        await query.answer()
+        _spawn(query.answer())
         await query.message.reply_text("Finish registration first or send /cancel.")
         return
 
     if action == "summary":
-        await query.answer("Fetching summary…")
+        _spawn(query.answer("Fetching summary…"))
         await action_summary(update, context)
     elif action == "register":
-        await query.answer()
+        _spawn(query.answer())
         await _prompt_registration(query)
     elif action == "upload_hint":
         await query.answer("Upload a PDF/image as a message.", show_alert=True)
     elif action == "open_switch":
-        await query.answer("Choose a profile to make it active.")
+        _spawn(query.answer("Choose a profile to make it active."))
         context.user_data["show_switch_panel"] = True
         await send_home_dashboard(update, context, as_new_message=False)
     elif action == "close_switch":
-        await query.answer("Hiding switch panel.")
+        _spawn(query.answer("Hiding switch panel."))
         context.user_data["show_switch_panel"] = False
         await send_home_dashboard(update, context, as_new_message=False)
     else:
-        await query.answer()
+        _spawn(query.answer())
 
 
 async def _prompt_registration(query):
@@ -264,20 +558,72 @@ async def _prompt_registration(query):
 async def register_button_entry(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     if query:
-        await query.answer()
-        context.user_data['registration_data'] = {}
-        # Suspend agents and mark registration active
-        context.chat_data['registration_active'] = True
-        context.chat_data['agents_suspended'] = True
+        _spawn(query.answer())
+        _enter_registration(context)
         await query.message.reply_text("Please enter your full name:")
     else:
-        # Suspend agents and mark registration active
-        context.chat_data['registration_active'] = True
-        context.chat_data['agents_suspended'] = True
+        _enter_registration(context)
         await update.effective_chat.send_message("Please enter your full name:")
     return AWAITING_NAME
 
 
+# Escaped summary header per mother_id: mother_id -> (built_at, html)
+_HEADER_CACHE: Dict[str, tuple] = {}
+HEADER_CACHE_TTL = 300
+HEADER_CACHE_MAXSIZE = 2000
+
+
+def _summary_header(mother_id: str, mother: Dict[str, Any]) -> str:
+    """Return the pre-escaped HTML header block for a mother's summary."""
+    hit = _lru_get(_HEADER_CACHE, mother_id, HEADER_CACHE_TTL)
+    if hit:
+        return hit[1]
+
+    escape = html.escape
+    name = mother.get("name", "Mother")
+    parts: List[str] = [
+        "<b>📊 Health Summary for ", escape(name), "</b>\n",
+        "<b>🆔 Mother ID:</b> <code>", escape(mother_id), "</code>\n",
+    ]
+    due_date = mother.get("due_date")
+    pregnancy_status = _calculate_pregnancy_status(due_date)
+    if pregnancy_status:
+        parts += ("<b>🤰 Pregnancy:</b> ", escape(pregnancy_status), "\n")
+    if due_date:
+        parts += ("<b>📅 Due Date:</b> ", escape(_format_date(due_date)), "\n")
+    location = mother.get("location")
+    if location:
+        parts += ("<b>📍 Location:</b> ", escape(location), "\n")
+    # Use a plain newline separator instead of unsupported <br>
+    parts.append("\n")
+
+    header = "".join(parts)
+    _lru_put(_HEADER_CACHE, mother_id, (time.monotonic(), header), HEADER_CACHE_MAXSIZE)
+    return header
+
+
+# Fixed section layout of the health summary; every block is pre-escaped HTML
+_SUMMARY_TEMPLATE = (
+    "{header}{notice}{timeline_block}{memories_block}{reports_block}{recs_block}{risks_block}"
+    "💬 Ask me anything for personalized guidance based on these records."
+)
+
+
+def _render_block(title: str, items: List[str]) -> str:
+    """Render a titled bullet list of pre-escaped items, or nothing when empty."""
+    if not items:
+        return ""
+    return f"{title}\n• " + "\n• ".join(items) + "\n\n"
+
+
+def _escaped_items(value: Any, limit: int = 5) -> List[str]:
+    if not value:
+        return []
+    if isinstance(value, list):
+        return [html.escape(str(item)) for item in value[:limit]]
+    return [html.escape(str(value))]
+
+
 async def action_summary(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Fetch and display an enriched health summary for the active mother."""
     query = update.callback_query
@@ -287,100 +633,65 @@ async def action_summary(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     mother_id = str(mother.get("id"))
-    name = mother.get("name", "Mother")
-    summary_lines = [
-        f"<b>📊 Health Summary for {html.escape(name)}</b>",
-        f"<b>🆔 Mother ID:</b> <code>{html.escape(mother_id)}</code>",
-    ]
-
-    pregnancy_status = _calculate_pregnancy_status(mother.get("due_date"))
-    if pregnancy_status:
-        summary_lines.append(f"<b>🤰 Pregnancy:</b> {html.escape(pregnancy_status)}")
-    if mother.get("due_date"):
-        summary_lines.append(f"<b>📅 Due Date:</b> {html.escape(_format_date(mother.get('due_date')))}")
-    if mother.get("location"):
-        summary_lines.append(f"<b>📍 Location:</b> {html.escape(mother.get('location'))}")
-    # Use a plain newline separator instead of unsupported <br>
-    summary_lines.append("")
-
-    try:
-        async with aiohttp.ClientSession() as session:
-            url = f"{BACKEND_API_BASE_URL}/api/v1/summary/{mother_id}"
-            timeout = aiohttp.ClientTimeout(total=25)
-            async with session.get(url, timeout=timeout) as resp:
-                if resp.status != 200:
-                    raise RuntimeError(f"Summary API returned {resp.status}")
-                summary_payload = await resp.json()
-    except Exception as exc:
-        logger.error(f"Summary endpoint failed: {exc}")
-        summary_lines.append("⚠️ Unable to fetch latest summary right now. Please try again later.")
-        await query.message.reply_text(
-            "\n".join(summary_lines),
-            parse_mode=ParseMode.HTML,
-            disable_web_page_preview=True,
-        )
-        return
+    escape = html.escape
 
-    recent_timeline = summary_payload.get("recent_timeline", [])[:MAX_TIMELINE_EVENTS]
-    key_memories = summary_payload.get("key_memories", [])[:MAX_MEMORIES]
-    reports = await get_recent_reports_for_mother(mother_id, limit=MAX_REPORTS)
-
-    if recent_timeline:
-        summary_lines.append("<b>🗂 Key Timeline Events:</b>")
-        for event in recent_timeline:
-            date = _format_date(event.get("event_date") or event.get("date") or event.get("created_at"))
-            text = event.get("summary") or event.get("event_summary") or "Update"
-            summary_lines.append(f"• {html.escape(date)}: {html.escape(text)}")
-        summary_lines.append("")
-
-    if key_memories:
-        summary_lines.append("<b>🧠 Important Notes:</b>")
-        for memory in key_memories:
-            summary_lines.append(
-                f"• {html.escape(str(memory.get('memory_key', 'Note')))}: "
-                f"{html.escape(str(memory.get('memory_value', '')))}"
-            )
-        summary_lines.append("")
-
-    if reports:
-        summary_lines.append("<b>📎 Uploaded Documents:</b>")
-        for report in reports:
-            title = report.get("file_name") or report.get("filename") or "Document"
-            uploaded_at = _format_date(report.get("uploaded_at") or report.get("created_at"))
-            analysis_summary = report.get("analysis_summary")
-            summary_lines.append(f"• {html.escape(uploaded_at)} — {html.escape(title)}")
-            if analysis_summary:
-                summary_lines.append(f"  ↳ {html.escape(str(analysis_summary))}")
-        summary_lines.append("")
-    else:
-        summary_lines.append("📎 No documents uploaded yet.")
-        summary_lines.append("")
+    # Summary API and report lookup are independent; overlap their I/O
+    summary_payload, reports = await asyncio.gather(
+        fetch_summary(mother_id),
+        get_recent_reports_for_mother(mother_id, limit=MAX_REPORTS),
+        return_exceptions=True,
+    )
+    if isinstance(reports, BaseException):
+        logger.error("Report lookup failed: %s", reports)
+        reports = []
+    notice = ""
+    if isinstance(summary_payload, BaseException):
+        logger.error("Summary endpoint failed: %s", summary_payload)
+        notice = "⚠️ Unable to fetch latest summary right now. Please try again later.\n\n"
+        summary_payload = {}
+
+    timeline_items = []
+    for event in summary_payload.get("recent_timeline", [])[:MAX_TIMELINE_EVENTS]:
+        date = _format_date(event.get("event_date") or event.get("date") or event.get("created_at"))
+        event_text = event.get("summary") or event.get("event_summary") or "Update"
+        timeline_items.append(f"{escape(date)}: {escape(event_text)}")
+
+    memory_items = [
+        f"{escape(str(memory.get('memory_key', 'Note')))}: {escape(str(memory.get('memory_value', '')))}"
+        for memory in summary_payload.get("key_memories", [])[:MAX_MEMORIES]
+    ]
 
-    if summary_payload.get("summary") and isinstance(summary_payload["summary"], dict):
-        overview = summary_payload["summary"]
+    report_items = []
+    for report in reports:
+        title = report.get("file_name") or report.get("filename") or "Document"
+        uploaded_at = _format_date(report.get("uploaded_at") or report.get("created_at"))
+        item = f"{escape(uploaded_at)} — {escape(title)}"
+        analysis_summary = report.get("analysis_summary")
+        if analysis_summary:
+            item += f"\n  ↳ {escape(str(analysis_summary))}"
+        report_items.append(item)
+
+    recommendations = risks = None
+    overview = summary_payload.get("summary")
+    if overview and isinstance(overview, dict):
         recommendations = overview.get("recommendations")
         risks = overview.get("risk_flags") or overview.get("risks")
-        if recommendations:
-            summary_lines.append("<b>✅ Recommendations:</b>")
-            if isinstance(recommendations, list):
-                for rec in recommendations[:5]:
-                    summary_lines.append(f"• {html.escape(str(rec))}")
-            else:
-                summary_lines.append(f"• {html.escape(str(recommendations))}")
-            summary_lines.append("")
-        if risks:
-            summary_lines.append("<b>⚠️ Risks / Alerts:</b>")
-            if isinstance(risks, list):
-                for risk in risks[:5]:
-                    summary_lines.append(f"• {html.escape(str(risk))}")
-            else:
-                summary_lines.append(f"• {html.escape(str(risks))}")
-            summary_lines.append("")
 
-    summary_lines.append("💬 Ask me anything for personalized guidance based on these records.")
+    text = _SUMMARY_TEMPLATE.format_map({
+        "header": _summary_header(mother_id, mother),
+        "notice": notice,
+        "timeline_block": _render_block("<b>🗂 Key Timeline Events:</b>", timeline_items),
+        "memories_block": _render_block("<b>🧠 Important Notes:</b>", memory_items),
+        "reports_block": (
+            _render_block("<b>📎 Uploaded Documents:</b>", report_items)
+            or "📎 No documents uploaded yet.\n\n"
+        ),
+        "recs_block": _render_block("<b>✅ Recommendations:</b>", _escaped_items(recommendations)),
+        "risks_block": _render_block("<b>⚠️ Risks / Alerts:</b>", _escaped_items(risks)),
+    })
 
     await query.message.reply_text(
-        "\n".join(summary_lines),
+        text,
         parse_mode=ParseMode.HTML,
         disable_web_page_preview=True,
     )
@@ -389,7 +700,7 @@ async def action_summary(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def handle_switch_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle switching between registered mothers via inline buttons."""
     query = update.callback_query
-    await query.answer()
+    _spawn(query.answer())
 
     # Block switching during active registration
     if context.chat_data.get('registration_active'):
@@ -399,12 +710,15 @@ async def handle_switch_callback(update: Update, context: ContextTypes.DEFAULT_T
     mother_id = query.data.replace("switch_mother_", "", 1)
     chat_id = context.user_data.get("chat_id") or str(query.message.chat.id)
 
-    mothers = context.user_data.get("mothers_list")
-    if not mothers:
-        mothers = await get_mothers_by_telegram_id(chat_id)
-        context.user_data["mothers_list"] = mothers
+    mothers_by_id = context.user_data.get("mothers_by_id")
+    if not mothers_by_id:
+        mothers = context.user_data.get("mothers_list") or await _load_mothers(context, chat_id)
+        if mothers is None:
+            await query.message.reply_text(MOTHERS_LOAD_FAIL_MSG)
+            return
+        mothers_by_id = _remember_mothers(context, mothers)
 
-    target = next((m for m in mothers if str(m.get("id")) == mother_id), None)
+    target = mothers_by_id.get(mother_id)
     if not target:
         await query.message.reply_text("⚠️ Could not find that profile. Please try again.")
         return
@@ -414,6 +728,82 @@ async def handle_switch_callback(update: Update, context: ContextTypes.DEFAULT_T
     await send_home_dashboard(update, context, as_new_message=False)
 
 
+async def _bg_analyze(processing_msg, payload: Dict[str, Any], filename: str) -> None:
+    """POST a report to the analyzer and edit the upload message with the result."""
+    try:
+        session = await get_session()
+        analyze_url = f"{BACKEND_API_BASE_URL}/analyze-report"
+        timeout = aiohttp.ClientTimeout(total=60)
+        async with session.post(analyze_url, json=payload, timeout=timeout) as resp:
+            if resp.status == 200:
+                analysis = await resp.json(content_type=None, loads=orjson.loads)
+                invalidate_summary_cache(payload.get("mother_id"))
+                concerns = analysis.get("concerns") or []
+                risk_level = (analysis.get("risk_level") or "normal").upper()
+                msg = (
+                    f"✅ *Document uploaded & analyzed!*\n\n"
+                    f"📄 File: {filename}\n"
+                    f"📊 Risk Level: {risk_level}\n"
+                )
+                if concerns:
+                    msg += "⚠️ Concerns:\n"
+                    for concern in concerns[:3]:
+                        msg += f"• {concern}\n"
+                msg += "\nUse /start to refresh your dashboard."
+                await processing_msg.edit_text(msg, parse_mode=ParseMode.MARKDOWN)
+            else:
+                await processing_msg.edit_text(
+                    "✅ Document uploaded!\n\n"
+                    "Analysis will continue in the background. "
+                    "Check back in a minute.",
+                    parse_mode=ParseMode.MARKDOWN,
+                )
+    except Exception as api_error:
+        logger.error("Document analysis error: %s", api_error)
+        try:
+            await processing_msg.edit_text(
+                "✅ Document uploaded!\n\n"
+                "Analysis is running in the background.",
+                parse_mode=ParseMode.MARKDOWN,
+            )
+        except Exception:
+            pass
+
+
+async def _store_report_file(file_info, mother_id, report_id: str, file_type: str) -> tuple:
+    """
+    Copy a Telegram file into Supabase storage once and return (signed_url, storage_path).
+    Falls back to the Telegram file URL if the storage upload fails.
+    """
+    # Keys are built from IDs only; user filenames (often non-ASCII) are rejected by storage
+    storage_path = f"{mother_id}/{report_id}.{file_type}"
+    try:
+        data = bytes(await file_info.download_as_bytearray())
+        content_type = mimetypes.guess_type(storage_path)[0] or "application/octet-stream"
+        bucket = supabase.storage.from_(REPORTS_BUCKET)
+        await run_db(
+            bucket.upload, storage_path, data, {"content-type": content_type}
+        )
+        signed = await run_db(
+            bucket.create_signed_url, storage_path, REPORT_URL_TTL_SECONDS
+        )
+        signed_url = signed.get("signedURL") or signed.get("signedUrl")
+        if signed_url:
+            return signed_url, storage_path
+        raise RuntimeError("storage did not return a signed URL")
+    except Exception as exc:
+        # The fallback URL embeds the bot token; surface it so the bucket gets fixed
+        logger.error(
+            "Report storage upload to bucket %r failed; falling back to the Telegram file URL: %s",
+            REPORTS_BUCKET, exc,
+        )
+
+    file_url = file_info.file_path
+    if not file_url.startswith("http"):
+        file_url = f"https://api.telegram.org/file/bot{TELEGRAM_BOT_TOKEN}/{file_url}"
+    return file_url, file_url
+
+
 async def handle_document_upload(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle PDF/image uploads and push them to Supabase for analysis."""
     # Block uploads during active registration
@@ -428,8 +818,10 @@ async def handle_document_upload(update: Update, context: ContextTypes.DEFAULT_T
     mothers = context.user_data.get("mothers_list")
     if not mother:
         if not mothers:
-            mothers = await get_mothers_by_telegram_id(chat_id)
-            context.user_data["mothers_list"] = mothers
+            mothers = await _load_mothers(context, chat_id)
+            if mothers is None:
+                await update.message.reply_text(MOTHERS_LOAD_FAIL_MSG)
+                return
         if mothers:
             mother = mothers[0]
             context.user_data["active_mother"] = mother
@@ -451,9 +843,11 @@ async def handle_document_upload(update: Update, context: ContextTypes.DEFAULT_T
         if document:
             file_info = await context.bot.get_file(document.file_id)
             filename = document.file_name or f"document_{document.file_id}"
-            file_type = filename.split(".")[-1].lower() if "." in filename else "unknown"
+            _, dot, ext = filename.rpartition(".")
+            file_type = ext.lower() if dot else "unknown"
         elif photo:
-            largest_photo = max(photo, key=lambda p: p.file_size or 0)
+            # Bot API lists photo sizes smallest to largest
+            largest_photo = photo[-1]
             file_info = await context.bot.get_file(largest_photo.file_id)
             filename = f"photo_{largest_photo.file_id}.jpg"
             file_type = "jpg"
@@ -461,7 +855,7 @@ async def handle_document_upload(update: Update, context: ContextTypes.DEFAULT_T
             await update.message.reply_text("Please send a PDF or image to upload.")
             return
 
-        if file_type not in ["pdf", "jpg", "jpeg", "png", "webp"]:
+        if file_type not in _ALLOWED_TYPES:
             await update.message.reply_text(
                 f"❌ Unsupported file type: {file_type}. Please upload PDF or image files."
             )
@@ -473,11 +867,9 @@ async def handle_document_upload(update: Update, context: ContextTypes.DEFAULT_T
             parse_mode=ParseMode.MARKDOWN,
         )
 
-        file_url = file_info.file_path
-        if not file_url.startswith("http"):
-            file_url = f"https://api.telegram.org/file/bot{TELEGRAM_BOT_TOKEN}/{file_url}"
-
         report_id = str(uuid4())
+        file_url, file_path = await _store_report_file(file_info, mother_id, report_id, file_type)
+        now_iso = datetime.now().isoformat()
         insert_data = {
             "id": report_id,
             "mother_id": mother_id,
@@ -485,54 +877,27 @@ async def handle_document_upload(update: Update, context: ContextTypes.DEFAULT_T
             "file_name": filename,
             "file_type": file_type,
             "file_url": file_url,
-            "file_path": file_url,
-            "uploaded_at": datetime.now().isoformat(),
+            "file_path": file_path,
+            "uploaded_at": now_iso,
             "analysis_status": "processing",
-            "created_at": datetime.now().isoformat(),
+            "created_at": now_iso,
         }
 
-        supabase.table("medical_reports").insert(insert_data).execute()
+        await run_db(supabase.table("medical_reports").insert(insert_data).execute)
+        invalidate_summary_cache(mother_id)
 
-        try:
-            async with aiohttp.ClientSession() as session:
-                analyze_url = f"{BACKEND_API_BASE_URL}/analyze-report"
-                payload = {
-                    "mother_id": str(mother_id),
-                    "report_id": report_id,
-                    "file_url": file_url,
-                    "file_type": file_type,
-                }
-                timeout = aiohttp.ClientTimeout(total=60)
-                async with session.post(analyze_url, json=payload, timeout=timeout) as resp:
-                    if resp.status == 200:
-                        analysis = await resp.json()
-                        concerns = analysis.get("concerns") or []
-                        risk_level = (analysis.get("risk_level") or "normal").upper()
-                        msg = (
-                            f"✅ *Document uploaded & analyzed!*\n\n"
-                            f"📄 File: {filename}\n"
-                            f"📊 Risk Level: {risk_level}\n"
-                        )
-                        if concerns:
-                            msg += "⚠️ Concerns:\n"
-                            for concern in concerns[:3]:
-                                msg += f"• {concern}\n"
-                        msg += "\nUse /start to refresh your dashboard."
-                        await processing_msg.edit_text(msg, parse_mode=ParseMode.MARKDOWN)
-                    else:
-                        await processing_msg.edit_text(
-                            "✅ Document uploaded!\n\n"
-                            "Analysis will continue in the background. "
-                            "Check back in a minute.",
-                            parse_mode=ParseMode.MARKDOWN,
-                        )
-        except Exception as api_error:
-            logger.error(f"Document analysis error: {api_error}")
-            await processing_msg.edit_text(
-                "✅ Document uploaded!\n\n"
-                "Analysis is running in the background.",
-                parse_mode=ParseMode.MARKDOWN,
-            )
+        await processing_msg.edit_text(
+            f"✅ Uploaded *{filename}*\n"
+            f"🔍 Analyzing in the background...",
+            parse_mode=ParseMode.MARKDOWN,
+        )
+        payload = {
+            "mother_id": str(mother_id),
+            "report_id": report_id,
+            "file_url": file_url,
+            "file_type": file_type,
+        }
+        _spawn(_bg_analyze(processing_msg, payload, filename))
 
         await save_chat_history(
             mother_id,
@@ -541,7 +906,7 @@ async def handle_document_upload(update: Update, context: ContextTypes.DEFAULT_T
             telegram_chat_id=chat_id,
         )
     except Exception as exc:
-        logger.error(f"Document upload failed: {exc}", exc_info=True)
+        logger.error("Document upload failed: %s", exc, exc_info=True)
         await update.message.reply_text(
             f"❌ Error uploading document: {exc}\nPlease try again."
         )
@@ -550,13 +915,13 @@ async def receive_language(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Handle both text replies and button callbacks
     query = update.callback_query
     if query:
-        await query.answer()
+        _spawn(query.answer())
         data = (query.data or "").strip()
         code = data.replace("lang_", "", 1) if data.startswith("lang_") else data
-        lang = LANG_MAP.get(code.lower())
+        lang = LANG_MAP.get(code.casefold())
         target = query.message
     else:
-        text = (update.message.text or "").strip().lower()
+        text = (update.message.text or "").strip().casefold()
         lang = LANG_MAP.get(text)
         target = update.message
 
@@ -692,6 +1057,10 @@ async def receive_bmi(update: Update, context: ContextTypes.DEFAULT_TYPE):
     return AWAITING_LANGUAGE
 
 # === Finalize registration and persist to Supabase ===
+REG_FAIL_MSG = "⚠️ Could not save registration right now. Please try again later."
+
+# No duplicate-submit guard is needed: the Application runs without concurrent_updates,
+# so a repeated reply is only handled after the conversation has already ended.
 async def finalize_registration(target, context: ContextTypes.DEFAULT_TYPE):
     data = context.user_data.get('registration_data', {})
     chat_id = str(getattr(getattr(target, 'chat', None), 'id', '') or (getattr(getattr(target, 'from_user', None), 'id', '') or ''))
@@ -707,72 +1076,65 @@ async def finalize_registration(target, context: ContextTypes.DEFAULT_TYPE):
         "bmi": data.get("bmi"),
         "preferred_language": data.get("preferred_language") or "en",
         "telegram_chat_id": chat_id,
+        "created_at": datetime.now().isoformat(),
     }
 
     try:
-        api_url = f"{BACKEND_API_BASE_URL}/mothers/register"
-        async with aiohttp.ClientSession() as session:
-            async with session.post(api_url, json=payload) as resp:
-                ok = resp.status in (200, 201)
-                body = await resp.json(content_type=None)
-                if ok and body.get("status") == "success":
-                    saved = body.get("data") or {}
-                    context.chat_data['registration_active'] = False
-                    context.chat_data['agents_suspended'] = False
-                    context.user_data.pop('registration_data', None)
-                    await target.reply_text("✅ Registration saved! Loading your dashboard...")
-                    mothers = await get_mothers_by_telegram_id(chat_id) if callable(get_mothers_by_telegram_id) else None
-                    await send_home_dashboard(target, context, mother=saved, mothers=mothers, as_new_message=True)
-                    return ConversationHandler.END
-                else:
-                    logger.warning(f"Backend register failed: status={resp.status} body={body}")
-        try:
-            res = supabase.table("mothers").insert(payload).execute()
-            saved = res.data[0] if hasattr(res, 'data') and res.data else None
-            context.chat_data['registration_active'] = False
-            context.chat_data['agents_suspended'] = False
-            context.user_data.pop('registration_data', None)
-            await target.reply_text("✅ Registration saved! Loading your dashboard...")
-            mothers = await get_mothers_by_telegram_id(chat_id) if callable(get_mothers_by_telegram_id) else None
-            await send_home_dashboard(target, context, mother=saved, mothers=mothers, as_new_message=True)
-        except Exception as db_exc:
-            logger.error(f"Registration save failed via Supabase: {db_exc}", exc_info=True)
-            await target.reply_text("⚠️ Could not save registration right now. Please try again later.")
-        return ConversationHandler.END
-    except Exception as exc:
-        logger.error(f"Registration flow error: {exc}", exc_info=True)
-        await target.reply_text("⚠️ Could not save registration right now. Please try again later.")
-        return ConversationHandler.END
+        # The backend /mothers/register endpoint runs this same insert; writing
+        # directly saves a serial HTTP round-trip on the confirm path
+        saved = await insert_mother(payload)
+        _end_registration(context)
+        await target.reply_text("✅ Registration saved! Loading your dashboard...")
+        prior = _fresh_cached_mothers(chat_id)
+        if saved and context.chat_data.get("had_prior_mothers") is False:
+            # First mother for this chat: the inserted row is the whole list
+            mothers = [saved]
+            prime_mothers_cache(chat_id, mothers)
+            _remember_mothers(context, mothers)
+        elif saved and prior is not None:
+            # Newest first, matching get_mothers_by_telegram_id ordering
+            mothers = [saved] + prior
+            prime_mothers_cache(chat_id, mothers)
+            _remember_mothers(context, mothers)
+        else:
+            invalidate_mothers_cache(chat_id)
+            mothers = await _load_mothers(context, chat_id)
+        await send_home_dashboard(target, context, mother=saved, mothers=mothers, as_new_message=True)
+    except Exception:
+        logger.exception("Registration save failed")
+        _end_registration(context)
+        await target.reply_text(REG_FAIL_MSG)
+    return ConversationHandler.END
 
 # === Confirm registration callback ===
+_CONFIRM_YES = frozenset({'yes', 'accept', 'ok', 'confirm', 'y'})
+
+
 async def confirm_registration(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
-    await query.answer()
+    _spawn(query.answer())
     data = (getattr(query, 'data', '') or '')
-    action = data.split('_', 1)[1] if data.startswith('confirm_') else data
+    action = data.partition('_')[2] if data.startswith('confirm_') else data
     target = query.message
-    if action in ('yes','accept','ok','confirm','y'):
+    if action in _CONFIRM_YES:
         await target.reply_text('Processing your registration...')
         return await finalize_registration(target, context)
     else:
+        _end_registration(context)
         await target.reply_text('Registration not confirmed. You can update details or restart with /start.')
         return ConversationHandler.END
 
 # === Cancel registration command ===
 async def cancel_registration(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Clear any in-progress registration data and end the conversation
-    try:
-        context.user_data.pop('registration_data', None)
-    except Exception:
-        pass
-    context.chat_data['registration_active'] = False
-    context.chat_data['agents_suspended'] = False
+    _end_registration(context)
     await update.message.reply_text('Registration cancelled. You can start again anytime with /start.')
     return ConversationHandler.END
 
 # === Minimal text handler to satisfy imports ===
 async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    text = (update.message.text or "").strip()
-    if text.startswith("/"):
+    text = update.message.text
+    # Commands are routed elsewhere; check the first character without copying the text
+    if text and text[0] == "/":
         return
     await update.message.reply_text("I’m here to help. Use the menu buttons or type /start.")
@@ -100,4 +100,9 @@ create index if not exists idx_reports_mother_id on public.medical_reports(mothe
 create index if not exists idx_metrics_mother_id on public.health_metrics(mother_id);
 create index if not exists idx_context_memory_mother_id on public.context_memory(mother_id);
 create index if not exists idx_conversations_mother_id on public.conversations(mother_id);
-create index if not exists idx_agents_mother_id on public.agents(mother_id);
\ No newline at end of file
+create index if not exists idx_agents_mother_id on public.agents(mother_id);
+-- Storage
+-- Private bucket for uploaded medical reports (backend SUPABASE_REPORTS_BUCKET)
+insert into storage.buckets (id, name, public)
+values ('medical_reports', 'medical_reports', false)
+on conflict (id) do nothing;